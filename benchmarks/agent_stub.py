@@ -0,0 +1,79 @@
+"""Stand-in for the aca-py admin API, used by benchmarks."""
+
+import asyncio
+import itertools
+from typing import Dict
+
+from aiohttp import web
+
+
+class AgentStub:
+    """
+    Minimal admin API answering the requests made by the Controller.
+
+    Signing is simulated by sleeping `sign_costs[proof_type]` seconds per
+    issue request. Costs default to 0, i.e. only the service-side overhead
+    is measured.
+    """
+
+    def __init__(self, sign_costs: Dict[str, float] = None):
+        self.sign_costs = sign_costs or {}
+        self.ids = itertools.count()
+        self.n_requests = 0
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.post("/wallet/did/create", self.create_did),
+                web.post("/out-of-band/create-invitation", self.create_invitation),
+                web.get("/connections", self.query_connections),
+                web.delete("/connections/{id}", self.delete_record),
+                web.post("/issue-credential-2.0/send", self.send_credential),
+            ]
+        )
+        self.runner = None
+        self.url = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def create_did(self, request: web.Request):
+        self.n_requests += 1
+        body = await request.json()
+        key_type = body["options"]["key_type"]
+        return web.json_response(
+            {"result": {"did": f"did:key:{key_type}-{next(self.ids)}"}}
+        )
+
+    async def create_invitation(self, request: web.Request):
+        self.n_requests += 1
+        n = next(self.ids)
+        return web.json_response(
+            {"invitation_url": f"http://agent?oob={n:064x}", "invi_msg_id": str(n)}
+        )
+
+    async def query_connections(self, request: web.Request):
+        self.n_requests += 1
+        return web.json_response({"results": [{"connection_id": str(next(self.ids))}]})
+
+    async def delete_record(self, request: web.Request):
+        self.n_requests += 1
+        return web.json_response({})
+
+    async def send_credential(self, request: web.Request):
+        self.n_requests += 1
+        body = await request.json()
+        proof_type = body["filter"]["ld_proof"]["options"]["proofType"]
+        cost = self.sign_costs.get(proof_type, 0)
+        if cost:
+            await asyncio.sleep(cost)
+        return web.json_response({"cred_ex_id": str(next(self.ids)), "state": "done"})
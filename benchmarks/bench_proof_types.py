@@ -0,0 +1,196 @@
+"""
+Compare credential issuance latency across proof types.
+
+Runs the Controller issuance request path against a stand-in agent. The
+stand-in does not sign: it sleeps for an assumed signing time per proof type
+(DEFAULT_SIGN_COSTS). The results are simulated. Pass the signing times
+measured on your agent with `--sign-cost`, or 0 to measure only the service
+overhead, e.g.
+
+    python -m benchmarks.bench_proof_types --sign-cost BbsBlsSignature2020=0.04
+
+An untimed warm-up pass runs first. The issuances of each proof type are then
+split into rounds, and the proof types run in a shuffled order in each
+round, so that no proof type bears the setup cost or drifts in the agent.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import aiohttp
+
+from issuer_service.controller import Controller
+from issuer_service.presets import PROOF_TYPE_KEY_TYPES
+
+from .agent_stub import AgentStub
+
+# Assumed signing time per credential in seconds, not measured in this
+# benchmark. In aca-py, Ed25519 proofs are dominated by JSON-LD
+# canonicalization. BBS+ additionally signs every statement of the
+# canonical form, with operations on BLS12-381.
+DEFAULT_SIGN_COSTS = {
+    "BbsBlsSignature2020": 0.040,
+    "Ed25519Signature2018": 0.015,
+    "Ed25519Signature2020": 0.015,
+}
+
+
+def parse_cost(value: str):
+    proof_type, _, seconds = value.partition("=")
+    if proof_type not in PROOF_TYPE_KEY_TYPES:
+        raise argparse.ArgumentTypeError(f"unknown proof type {proof_type}")
+    return proof_type, float(seconds)
+
+
+async def issue_batch(
+    controller: Controller,
+    proof_type: str,
+    ids: range,
+    concurrency: int,
+    latencies: list,
+) -> float:
+    """Issue one credential per id, return the elapsed time."""
+    issuer_did = controller.issuer_did(proof_type)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def issue(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            credential = Controller.make_nextcloud_credential(
+                "Jane", "Doe", f"jane{i}@example.org", issuer_did, None, proof_type
+            )
+            await controller.auto_issue_credential(str(i), credential, proof_type)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(issue(i) for i in ids))
+    return time.perf_counter() - start
+
+
+def summarize(proof_type: str, latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "proof_type": proof_type,
+        "n": n,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[n // 2] * 1000,
+        "p95_ms": latencies[int(n * 0.95) - 1] * 1000,
+        "per_second": n / elapsed,
+    }
+
+
+async def bench_proof_types(
+    controller: Controller,
+    proof_types: list,
+    n: int,
+    concurrency: int,
+    rounds: int,
+    warmup: int,
+    seed: int = None,
+) -> list:
+    for proof_type in proof_types:
+        await issue_batch(controller, proof_type, range(warmup), concurrency, [])
+
+    rng = random.Random(seed)
+    latencies = {proof_type: [] for proof_type in proof_types}
+    elapsed = dict.fromkeys(proof_types, 0.0)
+    for r in range(rounds):
+        # spread n evenly over the rounds
+        ids = range(r * n // rounds, (r + 1) * n // rounds)
+        order = list(proof_types)
+        rng.shuffle(order)
+        for proof_type in order:
+            elapsed[proof_type] += await issue_batch(
+                controller, proof_type, ids, concurrency, latencies[proof_type]
+            )
+    return [
+        summarize(proof_type, latencies[proof_type], elapsed[proof_type])
+        for proof_type in proof_types
+    ]
+
+
+def sign_costs(args: argparse.Namespace) -> dict:
+    return {**DEFAULT_SIGN_COSTS, **dict(args.sign_cost)}
+
+
+async def run(args: argparse.Namespace):
+    agent = AgentStub(sign_costs(args))
+    url = await agent.start()
+    try:
+        async with aiohttp.ClientSession(base_url=url) as session:
+            controller = Controller(session, None)
+            for key_type in sorted(set(PROOF_TYPE_KEY_TYPES.values())):
+                controller.dids[key_type] = await controller.create_did(
+                    key_type=key_type
+                )
+            return await bench_proof_types(
+                controller,
+                args.proof_types,
+                args.n,
+                args.concurrency,
+                args.rounds,
+                args.warmup,
+                args.seed,
+            )
+    finally:
+        await agent.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-n", type=int, default=500, help="issuances per proof type")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="rounds the issuances are split into"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=50, help="untimed issuances per proof type"
+    )
+    parser.add_argument("--seed", type=int, help="seed of the round order")
+    parser.add_argument(
+        "--proof-types",
+        nargs="+",
+        choices=list(PROOF_TYPE_KEY_TYPES),
+        default=list(PROOF_TYPE_KEY_TYPES),
+    )
+    parser.add_argument(
+        "--sign-cost",
+        metavar="PROOF_TYPE=SECONDS",
+        type=parse_cost,
+        action="append",
+        default=[],
+        help="simulated signing time of the agent, overrides DEFAULT_SIGN_COSTS",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    costs = sign_costs(args)
+    for r in results:
+        r["simulated_sign_cost_ms"] = costs[r["proof_type"]] * 1000
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        "SIMULATED: the stand-in agent sleeps instead of signing; pass costs "
+        "measured on your agent with --sign-cost"
+    )
+    print(
+        f"{'proof type':<24}{'sign ms':>10}{'mean ms':>10}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'/s':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['proof_type']:<24}{r['simulated_sign_cost_ms']:>10.1f}"
+            f"{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}"
+            f"{r['p95_ms']:>10.2f}{r['per_second']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measure the time from process start until the service accepts connections.
+
+The service is started against an unreachable agent, which does not delay
+binding. Compare against a stored result to catch regressions:
+
+    python -m benchmarks.bench_startup --save startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+"""
+
+import argparse
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from . import regression
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_bind(timeout: float = 30) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "issuer_service",
+            "--agent-admin-api",
+            "http://127.0.0.1:9",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "critical",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    return time.perf_counter() - start
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"service exited with code {proc.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("service did not bind in time")
+                time.sleep(0.002)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-n", type=int, default=10, help="number of runs")
+    parser.add_argument("--save", metavar="FILE", help="write result as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="result to compare with")
+    parser.add_argument(
+        "--threshold",
+        metavar="PERCENT",
+        type=float,
+        default=20,
+        help="fail if the median is this much slower than the baseline",
+    )
+    args = parser.parse_args()
+
+    runs = sorted(time_to_bind() for _ in range(args.n))
+    result = {
+        "n": args.n,
+        "median_ms": statistics.median(runs) * 1000,
+        "min_ms": runs[0] * 1000,
+        "max_ms": runs[-1] * 1000,
+    }
+    print(
+        "time to bind: median %(median_ms).1fms, min %(min_ms).1fms, "
+        "max %(max_ms).1fms (%(n)d runs)" % result
+    )
+    if args.save:
+        regression.save(args.save, result)
+
+    if args.baseline:
+        baseline = regression.load(args.baseline)
+        if regression.compare(
+            {"time to bind": result["median_ms"]},
+            {"time to bind": baseline["median_ms"]},
+            args.threshold,
+        ):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
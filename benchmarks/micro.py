@@ -0,0 +1,229 @@
+"""
+Micro-benchmarks of controller, ws_client and view hot paths.
+
+Runs offline. Results are recorded as JSON; against a baseline, the run
+fails if a case got slower than the threshold allows:
+
+    python -m benchmarks.micro --save micro.json
+    python -m benchmarks.micro --baseline micro.json --threshold 25
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import sys
+import time
+from typing import Awaitable, Callable, List, Union
+
+import aiohttp
+
+from issuer_service.controller import Controller
+from issuer_service.presets import TEMPLATE_DIR
+from issuer_service.rendering import Templates
+from issuer_service.views import make_qr_b64
+from issuer_service.ws_client import WSClient
+
+from . import regression
+
+Op = Union[Callable[[], None], Callable[[], Awaitable[None]]]
+
+# name -> (async setup returning the op to time, ops per round)
+CASES = {}
+
+
+def case(name: str, number: int):
+    def register(setup: Callable[[], Awaitable[Op]]):
+        CASES[name] = (setup, number)
+        return setup
+
+    return register
+
+
+def connection_event(conn_id: str, state: str = "response") -> dict:
+    return {
+        "topic": "connections",
+        "payload": {"connection_id": conn_id, "state": state, "their_label": "x"},
+    }
+
+
+def ws_message(event: dict) -> aiohttp.WSMessage:
+    return aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, json.dumps(event), None)
+
+
+def keyed_streams_case(n_waiters: int):
+    """One stream per pending issuance, as opened by the controller."""
+
+    async def setup():
+        ws_client = WSClient(None, None)
+        conn_ids = [str(i) for i in range(n_waiters)]
+        for conn_id in conn_ids:
+            ws_client.stream(
+                ("connections", "issue_credential_v2_0"),
+                key=conn_id,
+                key_field="connection_id",
+            )
+        messages = [ws_message(connection_event(c)) for c in conn_ids[:1000]]
+        rng = random.Random(0)
+
+        async def op():
+            await ws_client.handle_msg(rng.choice(messages))
+
+        return op
+
+    return setup
+
+
+def filtered_waiters_case(n_waiters: int):
+    """Pending wait_for_event calls, none of which matches the event."""
+
+    async def setup():
+        ws_client = WSClient(None, None)
+        for i in range(n_waiters):
+            asyncio.create_task(
+                ws_client.wait_for_event(
+                    "connections",
+                    lambda ev, c=str(i): ev["payload"]["connection_id"] == c,
+                )
+            )
+        await asyncio.sleep(0)
+        message = ws_message(connection_event("unknown"))
+
+        async def op():
+            await ws_client.handle_msg(message)
+
+        return op
+
+    return setup
+
+
+for _n, _number in ((10_000, 2000), (100_000, 2000)):
+    case(f"handle_msg keyed streams {_n // 1000}k", _number)(keyed_streams_case(_n))
+for _n, _number in ((10_000, 20), (100_000, 5)):
+    case(f"handle_msg wait_for_event {_n // 1000}k", _number)(filtered_waiters_case(_n))
+
+
+@case("wait_for_event setup+teardown", 2000)
+async def wait_for_event_cycle():
+    ws_client = WSClient(None, None)
+    event = connection_event("1", "completed")
+
+    async def op():
+        waiter = asyncio.create_task(
+            ws_client.wait_for_event(
+                "connections", lambda ev: ev["payload"]["state"] == "completed", 1
+            )
+        )
+        await asyncio.sleep(0)
+        await ws_client.notify_subscribers("connections", event)
+        await waiter
+
+    return op
+
+
+@case("make_nextcloud_credential+issue_request+json", 10_000)
+async def issue_request():
+    def op():
+        credential = Controller.make_nextcloud_credential(
+            "Jane", "Doe", "jane@example.org", "did:key:z6Mk"
+        )
+        json.dumps(Controller.make_issue_request("conn-id", credential))
+
+    return op
+
+
+@case("make_qr_b64", 5)
+async def qr_code():
+    url = "https://agent.example.org?oob=" + "eyJAdHlwZSI6" * 40
+
+    def op():
+        make_qr_b64(url)
+
+    return op
+
+
+@case("render invitation.jinja2", 5000)
+async def render_invitation():
+    templates = Templates(TEMPLATE_DIR)
+    templates.warm_up()
+    context = {
+        "qr_b64": "iVBORw0KGgo" * 500,
+        "invitation_url": "https://agent.example.org?oob=" + "eyJAdHlwZSI6" * 40,
+        "timeout": 300,
+    }
+
+    def op():
+        templates.render("invitation.jinja2", context)
+
+    return op
+
+
+async def run_case(setup: Callable[[], Awaitable[Op]], number: int, rounds: int):
+    """Return the time per op in microseconds of the fastest round."""
+    op = await setup()
+    is_async = asyncio.iscoroutinefunction(op)
+    timings = []
+    # first round warms up and is discarded
+    for _ in range(rounds + 1):
+        gc.collect()
+        start = time.perf_counter()
+        if is_async:
+            for _ in range(number):
+                await op()
+        else:
+            for _ in range(number):
+                op()
+        timings.append((time.perf_counter() - start) / number * 1e6)
+    # cancel pending waiters of the case
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    await asyncio.sleep(0)
+    # the fastest round is the least disturbed by other load on the machine
+    return min(timings[1:])
+
+
+async def run(names: List[str], rounds: int, scale: float) -> dict:
+    results = {}
+    for name in names:
+        setup, number = CASES[name]
+        results[name] = await run_case(setup, max(1, int(number * scale)), rounds)
+        print(f"{name:<48}{results[name]:>12.2f}us/op")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-k", metavar="SUBSTRING", help="only run matching cases")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="factor applied to the number of ops per round",
+    )
+    parser.add_argument("--save", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="results to compare with")
+    parser.add_argument(
+        "--threshold",
+        metavar="PERCENT",
+        type=float,
+        default=25,
+        help="fail if a case is this much slower than in the baseline",
+    )
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.k or args.k in name]
+    results = asyncio.run(run(names, args.rounds, args.scale))
+    if args.save:
+        regression.save(args.save, {"unit": "us/op", "cases": results})
+
+    if args.baseline:
+        baseline = regression.load(args.baseline)
+        if regression.compare(results, baseline["cases"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Comparison of benchmark results against a stored baseline."""
+
+import json
+from typing import Dict, List, Tuple
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Compare timings (lower is better) with the baseline.
+    :param results: case -> timing
+    :param baseline: case -> timing of the baseline
+    :param threshold: allowed slowdown in percent
+    :return: (case, baseline, result, change in percent) of regressed cases
+
+    """
+    regressions = []
+    for name, value in results.items():
+        if not baseline.get(name):
+            continue
+        change = (value / baseline[name] - 1) * 100
+        print(f"{name:<40}{change:>+9.1f}%")
+        if change > threshold:
+            regressions.append((name, baseline[name], value, change))
+    for name, _, _, change in regressions:
+        print(f"REGRESSION: {name} is {change:.1f}% slower (threshold {threshold}%)")
+    return regressions
@@ -1,29 +1,64 @@
-import asyncio
-import logging
-import signal
+import sys
 
-import aiohttp
+from .profiling import StartupProfiler
 
-from configargparse import Namespace
+# installed before anything else is imported, so that all imports are timed
+profiler = StartupProfiler.from_argv(sys.argv)
 
-from .controller import Controller
-from .log import configure_logger
-from .parse import init_argparser
-from .webapp import Webapp
-from .ws_client import WSClient
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+import signal  # noqa: E402
+
+from argparse import Namespace  # noqa: E402
+
+import aiohttp  # noqa: E402
+
+from .controller import NEXTCLOUD_CREDENTIAL, Controller  # noqa: E402
+from .log import configure_logger  # noqa: E402
+from .parse import init_argparser  # noqa: E402
+from .presets import (  # noqa: E402
+    EVENT_SOURCE_BOTH,
+    EVENT_SOURCE_WEBHOOK,
+    EVENT_SOURCE_WEBSOCKET,
+)
+from .scheduler import AdminScheduler, Priority  # noqa: E402
+from .webapp import Webapp  # noqa: E402
+from .ws_client import WSClient  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
 
+def checkpoint(name: str):
+    if profiler:
+        profiler.checkpoint(name)
+
+
+checkpoint("imports")
+
+
 async def run(args: Namespace):
     session = aiohttp.ClientSession(base_url=args.agent_admin_api)
-    ws_client = WSClient("/ws", session)
+    ws_client = WSClient(
+        None if args.event_source == EVENT_SOURCE_WEBHOOK else "/ws",
+        session,
+        dedupe=args.event_source == EVENT_SOURCE_BOTH,
+    )
     controller = Controller(
         session,
         ws_client,
         args.did_seed,
         args.issuance_timeout,
         args.auto_remove_conn_record,
+        args.max_pending_issuances,
+        {NEXTCLOUD_CREDENTIAL: args.nextcloud_proof_type},
+        AdminScheduler(
+            args.admin_max_concurrency,
+            {
+                Priority.ISSUANCE: args.admin_issuance_concurrency,
+                Priority.CLEANUP: args.admin_cleanup_concurrency,
+            },
+            args.admin_cleanup_max_defer,
+        ),
     )
     webapp = Webapp()
 
@@ -53,11 +88,28 @@ async def run(args: Namespace):
         loop.add_signal_handler(sig, lambda: asyncio.create_task(shutdown(3)))
 
     await webapp.setup(
-        args.host, args.port, args.agent_admin_api, controller, args.oob_base_url
+        args.host,
+        args.port,
+        args.agent_admin_api,
+        controller,
+        args.oob_base_url,
+        args.idempotency_ttl,
+        args.event_source != EVENT_SOURCE_WEBSOCKET,
+        args.webhook_api_key,
     )
+    checkpoint("webapp setup")
 
     # run app and ws client
-    await webapp.start(session)
+    warm_up = await webapp.start(session)
+    checkpoint("bind")
+    if profiler:
+
+        def report(_):
+            checkpoint("warm-up (in background)")
+            profiler.uninstall()
+            logger.info(profiler.report())
+
+        warm_up.add_done_callback(report)
     # await ws_client.start()
     await controller.start()
 
@@ -66,7 +118,16 @@ def main():
     # read command line args
     parser = init_argparser()
     args = parser.parse_args()
+    if args.event_source != EVENT_SOURCE_WEBSOCKET and not args.webhook_api_key:
+        # the webhook route is public, unauthenticated events could be injected
+        parser.error(
+            f"--webhook-api-key is required with --event-source {args.event_source}"
+        )
+    checkpoint("parse args")
     configure_logger(args.log_level, args.log_config)
+    checkpoint("configure logger")
+    if args.profile_startup and not profiler:
+        logger.warning("profile-startup is ignored in config files")
 
     loop = asyncio.new_event_loop()
     try:
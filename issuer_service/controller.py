@@ -2,11 +2,20 @@ import asyncio
 import logging
 
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import aiohttp
 
-from .ws_client import WSClient
+from .presets import DEFAULT_PROOF_TYPE, PROOF_TYPE_CONTEXTS, PROOF_TYPE_KEY_TYPES
+from .registry import (
+    STATE_ISSUING,
+    IssuanceRegistry,
+    PendingIssuance,
+    RegistryFullError,
+    deep_sizeof,
+)
+from .scheduler import AdminScheduler, Priority
+from .ws_client import EventStream, WSClient
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +26,38 @@ OOB_CREATE_REQUEST_TEMPLATE = {
     "protocol_version": "1.1",
 }
 
+NEXTCLOUD_CREDENTIAL = "NextcloudCredential"
+
+TOPIC_CONNECTIONS = "connections"
+TOPIC_ISSUE_CREDENTIAL = "issue_credential_v2_0"
+
 
 def conn_completed_filter(event: dict, connection_id: str):
     conn_record: dict = event.get("payload", False)
     return (
         conn_record
+        and event.get("topic") == TOPIC_CONNECTIONS
         and conn_record["connection_id"] == connection_id
         and conn_record["state"] == "completed"
     )
 
 
+def conn_used_filter(event: dict, connection_id: str):
+    conn_record: dict = event.get("payload", False)
+    # the record is announced in invitation state when it is created
+    return (
+        conn_record
+        and event.get("topic") == TOPIC_CONNECTIONS
+        and conn_record.get("connection_id") == connection_id
+        and conn_record.get("state") != "invitation"
+    )
+
+
 def issuance_done_or_abandoned_filter(event: dict, cred_ex_id: str):
     cred_ex_record: dict = event.get("payload", False)
     return (
         cred_ex_record
+        and event.get("topic") == TOPIC_ISSUE_CREDENTIAL
         and cred_ex_record["cred_ex_id"] == cred_ex_id
         and cred_ex_record["state"] in ("done", "abandoned")
     )
@@ -44,6 +71,9 @@ class Controller:
         did_seed: str = None,
         issuance_timeout: float = None,
         auto_remove_conn_record: bool = None,
+        max_pending_issuances: int = None,
+        proof_types: Dict[str, str] = None,
+        scheduler: AdminScheduler = None,
         loop: asyncio.AbstractEventLoop = None,
     ):
         self.session = session
@@ -51,18 +81,50 @@ class Controller:
         self.did_seed = did_seed
         self.issuance_timeout = issuance_timeout
         self.auto_remove_conn_record = auto_remove_conn_record
+        self.registry = IssuanceRegistry(max_pending_issuances)
+        # credential type -> proof type
+        self.proof_types = proof_types or {}
+        self.scheduler = scheduler or AdminScheduler()
         self.loop = loop
-        self.did = None
+        # key type -> issuer did
+        self.dids: Dict[str, str] = {}
 
     async def start(self):
         if not self.loop:
             self.loop = asyncio.get_event_loop()
         await self.ws_client.start()
         # wait until aca-py is ready
-        logger.debug("waiting for message from aca-py...")
-        await self.ws_client.wait_for_event("settings")
-        # create issuer did
-        self.did = await self.create_did(seed=self.did_seed)
+        if self.ws_client.ws_endpoint:
+            logger.debug("waiting for message from aca-py...")
+            await self.ws_client.wait_for_event("settings")
+        else:
+            await self.wait_until_ready()
+        # create one issuer did per key type in use
+        key_types = {
+            PROOF_TYPE_KEY_TYPES[self.proof_type(cred_type)]
+            for cred_type in (NEXTCLOUD_CREDENTIAL, *self.proof_types)
+        }
+        for key_type in sorted(key_types):
+            self.dids[key_type] = await self.create_did(
+                key_type=key_type, seed=self.did_seed
+            )
+
+    def proof_type(self, credential_type: str) -> str:
+        return self.proof_types.get(credential_type, DEFAULT_PROOF_TYPE)
+
+    def issuer_did(self, proof_type: str) -> str:
+        return self.dids[PROOF_TYPE_KEY_TYPES[proof_type]]
+
+    async def wait_until_ready(self, interval: float = 1):
+        logger.debug("waiting for aca-py to become ready...")
+        while True:
+            try:
+                async with self.session.get("/status/ready") as resp:
+                    if resp.ok and (await resp.json()).get("ready"):
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(interval)
 
     async def create_did(
         self, method: str = "key", key_type: str = "bls12381g2", seed: str = None
@@ -74,9 +136,10 @@ class Controller:
         }
         if seed:
             request["seed"] = seed
-        async with self.session.post("/wallet/did/create", json=request) as resp:
-            resp.raise_for_status()
-            body = await resp.json()
+        async with self.scheduler.slot(Priority.INTERACTIVE):
+            async with self.session.post("/wallet/did/create", json=request) as resp:
+                resp.raise_for_status()
+                body = await resp.json()
         did: str = body["result"]["did"]
         logger.info("created did %s", did)
         return did
@@ -91,14 +154,44 @@ class Controller:
         timeout: float = None,
         auto_remove_conn_record: bool = None,
     ):
+        proof_type = self.proof_type(NEXTCLOUD_CREDENTIAL)
         credential = Controller.make_nextcloud_credential(
-            firstname, lastname, email, self.did, issuance_date
+            firstname,
+            lastname,
+            email,
+            self.issuer_did(proof_type),
+            issuance_date,
+            proof_type,
         )
-        asyncio.create_task(
+        record = PendingIssuance(connection_id, deep_sizeof(credential))
+        try:
+            evicted = self.registry.add(record)
+        except RegistryFullError:
+            # no room for another issuance -> invitation is unusable
+            self.discard_issuance(record)
+            raise
+        for old_record in evicted:
+            self.discard_issuance(old_record)
+        record.task = asyncio.create_task(
             self.issue_credential_when_connection_completed(
-                connection_id, credential, timeout, auto_remove_conn_record
+                connection_id, credential, timeout, auto_remove_conn_record, proof_type
             )
         )
+        record.task.add_done_callback(lambda _: self.registry.remove(connection_id))
+
+    def discard_issuance(self, record: PendingIssuance):
+        """Cancel an evicted issuance and delete its connection record."""
+        if record.task:
+            record.task.cancel()
+
+        async def _delete():
+            try:
+                await self.delete_record("connections", record.conn_id)
+                logger.debug("removed connection record %s", record.conn_id)
+            except aiohttp.ClientResponseError:
+                logger.error("could not remove connection record %s", record.conn_id)
+
+        asyncio.create_task(_delete())
 
     async def issue_credential_when_connection_completed(
         self,
@@ -106,65 +199,98 @@ class Controller:
         credential: dict,
         timeout: float = None,
         auto_remove_conn_record: bool = None,
+        proof_type: str = DEFAULT_PROOF_TYPE,
     ):
         timeout = timeout or self.issuance_timeout
         auto_remove_conn_record = bool(
             auto_remove_conn_record or self.auto_remove_conn_record
         )
-        error = None
-        try:
-            await self.ws_client.wait_for_event(
-                "connections",
-                lambda ev: conn_completed_filter(ev, conn_id),
-                timeout,
-            )
-            cred_ex_record = await self.auto_issue_credential(conn_id, credential)
-        except asyncio.TimeoutError as err:
-            error = err
-            logger.warning("Timeout during credential issuance.")
-        except aiohttp.ClientResponseError as err:
-            error = err
-            logger.error(
-                "Credential issuance failed. Agent response: %s (%s)",
-                err.message,
-                err.status,
-            )
-
-        if auto_remove_conn_record:
+        # one subscription follows the connection through all states of the
+        # connection and credential exchange, events in between are buffered
+        async with self.ws_client.stream(
+            (TOPIC_CONNECTIONS, TOPIC_ISSUE_CREDENTIAL),
+            key=conn_id,
+            key_field="connection_id",
+        ) as events:
+            record = self.registry.get(conn_id)
+            if record:
+                record.stream = events
+            error = None
             try:
-                if not error:
-                    try:
-                        await self.ws_client.wait_for_event(
-                            "issue_credential_v2_0",
-                            lambda ev: issuance_done_or_abandoned_filter(
-                                ev, cred_ex_record["cred_ex_id"]
-                            ),
-                            timeout,
-                        )
-                    except asyncio.TimeoutError:
-                        # timeout -> delete conn record
-                        pass
-                await self.delete_record("connections", conn_id)
-                logger.info("connection record removed")
-            except aiohttp.ClientResponseError:
-                logger.error("could not remove connection record %s", conn_id)
-
-    async def auto_issue_credential(self, conn_id, credential) -> dict:
-        issue_request = Controller.make_issue_request(conn_id, credential)
-        async with self.session.post(
-            "/issue-credential-2.0/send", json=issue_request
-        ) as resp:
-            resp.raise_for_status()
-            cred_ex_record = await resp.json()
+                await self.wait_for_connection(events, conn_id, timeout)
+                self.registry.set_state(conn_id, STATE_ISSUING)
+                cred_ex_record = await self.auto_issue_credential(
+                    conn_id, credential, proof_type
+                )
+            except asyncio.TimeoutError as err:
+                error = err
+                logger.warning("Timeout during credential issuance.")
+            except aiohttp.ClientResponseError as err:
+                error = err
+                logger.error(
+                    "Credential issuance failed. Agent response: %s (%s)",
+                    err.message,
+                    err.status,
+                )
+
+            if auto_remove_conn_record:
+                try:
+                    if not error:
+                        try:
+                            await events.wait_for(
+                                lambda ev: issuance_done_or_abandoned_filter(
+                                    ev, cred_ex_record["cred_ex_id"]
+                                ),
+                                timeout,
+                            )
+                        except asyncio.TimeoutError:
+                            # timeout -> delete conn record
+                            pass
+                    await self.delete_record("connections", conn_id)
+                    logger.info("connection record removed")
+                except aiohttp.ClientResponseError:
+                    logger.error("could not remove connection record %s", conn_id)
+
+    async def wait_for_connection(
+        self, events: EventStream, conn_id: str, timeout: float = None
+    ) -> dict:
+        """
+        Wait until the connection is completed and return the event.
+
+        The issuance is marked as used on the first event of the holder, so
+        that it is no longer evicted.
+        """
+
+        async def _wait():
+            async for event in events:
+                if conn_used_filter(event, conn_id):
+                    self.registry.mark_used(conn_id)
+                if conn_completed_filter(event, conn_id):
+                    return event
+            raise StopAsyncIteration
+
+        return await asyncio.wait_for(_wait(), timeout)
+
+    async def auto_issue_credential(
+        self, conn_id, credential, proof_type: str = DEFAULT_PROOF_TYPE
+    ) -> dict:
+        issue_request = Controller.make_issue_request(conn_id, credential, proof_type)
+        async with self.scheduler.slot(Priority.ISSUANCE):
+            async with self.session.post(
+                "/issue-credential-2.0/send", json=issue_request
+            ) as resp:
+                resp.raise_for_status()
+                cred_ex_record = await resp.json()
         return cred_ex_record
 
     async def create_oob_invitation(self, alias: str, my_label: str = None):
-        async with self.session.post(
-            "/out-of-band/create-invitation",
-            json=Controller.make_oob_create_request(alias),
-        ) as resp:
-            resp.raise_for_status()
-            invitation_record: dict = await resp.json()
+        async with self.scheduler.slot(Priority.INTERACTIVE):
+            async with self.session.post(
+                "/out-of-band/create-invitation",
+                json=Controller.make_oob_create_request(alias),
+            ) as resp:
+                resp.raise_for_status()
+                invitation_record: dict = await resp.json()
         return invitation_record
 
     async def query_connections(
@@ -176,15 +302,17 @@ class Controller:
         if state:
             params["state"] = state
 
-        async with self.session.get("/connections", params=params) as resp:
-            resp.raise_for_status()
-            results_obj = await resp.json()
+        async with self.scheduler.slot(Priority.INTERACTIVE):
+            async with self.session.get("/connections", params=params) as resp:
+                resp.raise_for_status()
+                results_obj = await resp.json()
 
         return results_obj["results"]
 
     async def delete_record(self, protocol: str, record_id: str):
-        async with self.session.delete(f"/{protocol}/{record_id}") as resp:
-            resp.raise_for_status()
+        async with self.scheduler.slot(Priority.CLEANUP):
+            async with self.session.delete(f"/{protocol}/{record_id}") as resp:
+                resp.raise_for_status()
 
     @staticmethod
     def make_oob_create_request(alias: str):
@@ -199,6 +327,7 @@ class Controller:
         email: str,
         issuer_did: str,
         issuance_date: str = None,
+        proof_type: str = DEFAULT_PROOF_TYPE,
     ):
         if not issuance_date:
             issuance_date = (
@@ -208,13 +337,16 @@ class Controller:
                 .replace("+00:00", "Z")
             )
 
+        context = [
+            "https://www.w3.org/2018/credentials/v1",
+            "https://agents.labor.gematik.de/credential/nextcloudCredential",
+        ]
+        if proof_type in PROOF_TYPE_CONTEXTS:
+            context.append(PROOF_TYPE_CONTEXTS[proof_type])
+
         return {
-            "@context": [
-                "https://www.w3.org/2018/credentials/v1",
-                "https://agents.labor.gematik.de/credential/nextcloudCredential",
-                "https://w3id.org/security/bbs/v1",
-            ],
-            "type": ["VerifiableCredential", "NextcloudCredential"],
+            "@context": context,
+            "type": ["VerifiableCredential", NEXTCLOUD_CREDENTIAL],
             "credentialSubject": {
                 "givenName": firstname,
                 "familyName": lastname,
@@ -226,7 +358,7 @@ class Controller:
 
     @staticmethod
     def make_issue_request(
-        conn_id: str, credential: dict, proof_type: str = "BbsBlsSignature2020"
+        conn_id: str, credential: dict, proof_type: str = DEFAULT_PROOF_TYPE
     ):
         return {
             "connection_id": conn_id,
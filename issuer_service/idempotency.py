@@ -0,0 +1,102 @@
+"""Cache of invitations handed out for recent form submissions."""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .presets import IDEMPOTENCY_WAIT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Optional[str]) -> str:
+    """Derive a cache key from the submitted form values."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").strip().lower().encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedInvitation:
+    """Invitation created for a submission, resolved once the agent replied."""
+
+    __slots__ = ("future", "expires")
+
+    def __init__(self, future: asyncio.Future, expires: float):
+        self.future = future
+        self.expires = expires
+
+
+class InvitationCache:
+    """
+    Maps submission keys to the invitation created for them.
+
+    Entries expire after `ttl` seconds. A submission that arrives while the
+    invitation for the same key is still being created waits for it, for up
+    to `wait_timeout` seconds, instead of creating another one.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int = None,
+        wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.entries: OrderedDict[str, CachedInvitation] = OrderedDict()
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[CachedInvitation]:
+        entry = self.entries.get(key)
+        if entry and entry.expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        return entry
+
+    def reserve(self, key: str) -> CachedInvitation:
+        """Create a pending entry for key, resolved by setting its future."""
+        self.expire()
+        future = asyncio.get_event_loop().create_future()
+        entry = CachedInvitation(future, time.monotonic() + self.ttl)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if self.max_size:
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return entry
+
+    async def wait(self, entry: CachedInvitation) -> Optional[dict]:
+        """
+        Wait for the invitation of entry.
+        :return: the invitation, or None if it failed or took too long
+
+        """
+        # unlike wait_for, wait neither cancels the future nor raises
+        done, _ = await asyncio.wait({entry.future}, timeout=self.wait_timeout)
+        if not done or entry.future.cancelled():
+            return None
+        return entry.future.result()
+
+    def fail(self, key: str, entry: CachedInvitation):
+        """Drop entry, submissions waiting for it create their own invitation."""
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+        entry.future.cancel()
+
+    def expire(self):
+        """Drop expired entries from the front of the cache."""
+        now = time.monotonic()
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry.expires > now:
+                break
+            del self.entries[key]
@@ -52,12 +52,102 @@ def init_argparser():
             "After a timeout, the invitation becomes invalid."
         ),
     )
+    parser.add_argument(
+        "--event-source",
+        choices=[EVENT_SOURCE_WEBSOCKET, EVENT_SOURCE_WEBHOOK, EVENT_SOURCE_BOTH],
+        env_var="WEBAPP_EVENT_SOURCE",
+        default=DEFAULT_EVENT_SOURCE,
+        help=(
+            "how to receive agent events. Webhooks are received at "
+            "/topic/{topic}/ on the public port; point the agent's --webhook-url "
+            "to this server. Requires --webhook-api-key, as anyone reaching the "
+            "port could otherwise inject agent events."
+        ),
+    )
+    parser.add_argument(
+        "--webhook-api-key",
+        metavar="KEY",
+        type=str,
+        env_var="WEBAPP_WEBHOOK_API_KEY",
+        help=(
+            "api key the agent sends with webhooks (x-api-key header), "
+            "set via the agent's --webhook-url http://<host>:<port>#<key>. "
+            "Required if --event-source is webhook or both."
+        ),
+    )
     parser.add_argument(
         "--auto-remove-conn-record",
         action=BooleanOptionalAction,
         default=AUTO_REMOVE_CONN_RECORD,
         help="remove connection record after issuance or timeout",
     )
+    parser.add_argument(
+        "--max-pending-issuances",
+        metavar="N",
+        type=int,
+        env_var="WEBAPP_MAX_PENDING_ISSUANCES",
+        default=MAX_PENDING_ISSUANCES,
+        help=(
+            "Maximum number of pending issuances. When reached, the oldest "
+            "unused invitations are discarded. 0 means no limit."
+        ),
+    )
+    parser.add_argument(
+        "--idempotency-ttl",
+        metavar="SECONDS",
+        type=float,
+        env_var="WEBAPP_IDEMPOTENCY_TTL",
+        default=IDEMPOTENCY_TTL,
+        help=(
+            "Period during which repeated submissions of the same form data "
+            "are answered with the same invitation. 0 disables reuse."
+        ),
+    )
+    parser.add_argument(
+        "--nextcloud-proof-type",
+        choices=list(PROOF_TYPE_KEY_TYPES),
+        env_var="WEBAPP_NEXTCLOUD_PROOF_TYPE",
+        default=DEFAULT_PROOF_TYPE,
+        help=(
+            "proof type for Nextcloud credentials. Ed25519 signatures are "
+            "considerably faster to create than BBS+ signatures."
+        ),
+    )
+    parser.add_argument(
+        "--admin-max-concurrency",
+        metavar="N",
+        type=int,
+        env_var="WEBAPP_ADMIN_MAX_CONCURRENCY",
+        default=ADMIN_MAX_CONCURRENCY,
+        help=(
+            "maximum number of concurrent admin api calls. Calls a user waits "
+            "for are started before issuance and cleanup calls. 0 means no limit."
+        ),
+    )
+    parser.add_argument(
+        "--admin-issuance-concurrency",
+        metavar="N",
+        type=int,
+        env_var="WEBAPP_ADMIN_ISSUANCE_CONCURRENCY",
+        default=ADMIN_ISSUANCE_CONCURRENCY,
+        help="maximum number of concurrent credential issuance calls",
+    )
+    parser.add_argument(
+        "--admin-cleanup-concurrency",
+        metavar="N",
+        type=int,
+        env_var="WEBAPP_ADMIN_CLEANUP_CONCURRENCY",
+        default=ADMIN_CLEANUP_CONCURRENCY,
+        help="maximum number of concurrent record removal calls",
+    )
+    parser.add_argument(
+        "--admin-cleanup-max-defer",
+        metavar="SECONDS",
+        type=float,
+        env_var="WEBAPP_ADMIN_CLEANUP_MAX_DEFER",
+        default=ADMIN_CLEANUP_MAX_DEFER,
+        help="maximum time record removal is deferred while the agent is busy",
+    )
     parser.add_argument(
         "--did-seed",
         metavar="SEED",
@@ -72,6 +162,16 @@ def init_argparser():
         env_var="WEBAPP_OOB_BASE_URL",
         help="url used to construct invitation url",
     )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        env_var="WEBAPP_PROFILE_STARTUP",
+        help=(
+            "log import times by module and durations of startup phases. "
+            "Only read from the command line and the environment, not from "
+            "config files."
+        ),
+    )
     excl_group = parser.add_mutually_exclusive_group()
     excl_group.add_argument(
         "--log-level",
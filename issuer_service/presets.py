@@ -8,3 +8,30 @@ DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 4567
 DEFAULT_LOG_LEVEL = "info"
 AUTO_REMOVE_CONN_RECORD = True
+EVENT_SOURCE_WEBSOCKET = "websocket"
+EVENT_SOURCE_WEBHOOK = "webhook"
+EVENT_SOURCE_BOTH = "both"
+DEFAULT_EVENT_SOURCE = EVENT_SOURCE_WEBSOCKET
+MAX_PENDING_ISSUANCES = 10000
+ADMIN_MAX_CONCURRENCY = 10
+ADMIN_ISSUANCE_CONCURRENCY = 8
+ADMIN_CLEANUP_CONCURRENCY = 2
+ADMIN_CLEANUP_MAX_DEFER = 60
+
+# proof type -> key type of the issuer did
+PROOF_TYPE_KEY_TYPES = {
+    "BbsBlsSignature2020": "bls12381g2",
+    "Ed25519Signature2018": "ed25519",
+    "Ed25519Signature2020": "ed25519",
+}
+# proof type -> context defining the proof type (if not in credentials/v1)
+PROOF_TYPE_CONTEXTS = {
+    "BbsBlsSignature2020": "https://w3id.org/security/bbs/v1",
+    "Ed25519Signature2020": "https://w3id.org/security/suites/ed25519-2020/v1",
+}
+DEFAULT_PROOF_TYPE = "BbsBlsSignature2020"
+IDEMPOTENCY_TTL = 300
+# seconds a repeated submission waits for the invitation of the first one
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+# seconds an invitation must still be valid to be handed out again
+IDEMPOTENCY_MIN_VALIDITY = 60
@@ -0,0 +1,140 @@
+"""Startup profiling.
+
+Only depends on the standard library, so that it can be installed before the
+rest of the service is imported.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_STARTUP_FLAG = "--profile-startup"
+PROFILE_STARTUP_ENV_VAR = "WEBAPP_PROFILE_STARTUP"
+
+
+class _ImportTimer(MetaPathFinder):
+    """Meta path finder timing the execution of module bodies."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        # builtin and frozen importers are classes shared by all their modules
+        if loader is None or isinstance(loader, type):
+            return spec
+        exec_module = getattr(loader, "exec_module", None)
+        if exec_module is None:
+            return spec
+
+        profiler = self.profiler
+
+        def timed_exec_module(module):
+            stack = profiler.children
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = time.perf_counter() - start
+                children = stack.pop()
+                profiler.imports[fullname] = (cumulative - children, cumulative)
+                if stack:
+                    stack[-1] += cumulative
+
+        loader.exec_module = timed_exec_module
+        return spec
+
+
+class StartupProfiler:
+    """Collects import times by module and durations of startup phases."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # module -> (self seconds, cumulative seconds)
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        # per thread: cumulative time of nested imports, one entry per import
+        # in progress (warm-up imports in an executor thread)
+        self._local = threading.local()
+        # (phase, offset from start, duration)
+        self.phases: List[Tuple[str, float, float]] = []
+        self.last_checkpoint = self.start
+        self.timer = _ImportTimer(self)
+
+    @property
+    def children(self) -> List[float]:
+        try:
+            return self._local.children
+        except AttributeError:
+            self._local.children = []
+            return self._local.children
+
+    @classmethod
+    def from_argv(cls, argv: List[str], environ: Mapping[str, str] = os.environ):
+        """
+        Return an installed profiler if startup profiling was requested.
+
+        Config files are read after the imports to be timed, so only the
+        command line flag and the environment variable are honoured.
+        """
+        enabled = environ.get(PROFILE_STARTUP_ENV_VAR, "").lower() in (
+            "true",
+            "yes",
+            "1",
+        )
+        if PROFILE_STARTUP_FLAG not in argv and not enabled:
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self):
+        sys.meta_path.insert(0, self.timer)
+
+    def uninstall(self):
+        if self.timer in sys.meta_path:
+            sys.meta_path.remove(self.timer)
+
+    def checkpoint(self, name: str):
+        """Record phase `name` as lasting from the previous checkpoint until now."""
+        now = time.perf_counter()
+        start, self.last_checkpoint = self.last_checkpoint, now
+        self.phases.append((name, start - self.start, now - start))
+
+    def report(self, top: int = 15) -> str:
+        lines = [
+            "startup profile (%.1fms since profiler start)"
+            % ((time.perf_counter() - self.start) * 1000),
+            "  phases:",
+        ]
+        for name, offset, duration in self.phases:
+            lines.append(
+                f"    {name:<32}{duration * 1000:>9.1f}ms  (at {offset * 1000:.1f}ms)"
+            )
+        total = sum(self_time for self_time, _ in self.imports.values())
+        lines.append(
+            f"  imports: {len(self.imports)} modules, {total * 1000:.1f}ms total, "
+            f"top {top} by self time:"
+        )
+        by_self_time = sorted(self.imports.items(), key=lambda i: i[1][0], reverse=True)
+        for module, (self_time, cumulative) in by_self_time[:top]:
+            lines.append(
+                f"    {module:<40}{self_time * 1000:>9.1f}ms"
+                f"  (cumulative {cumulative * 1000:.1f}ms)"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,185 @@
+"""Registry of pending issuances."""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# invitation created, holder has not used it yet
+STATE_INVITATION = "invitation"
+# holder used the invitation, connection is being established
+STATE_CONNECTING = "connecting"
+# connection completed, credential is being issued
+STATE_ISSUING = "issuing"
+
+STATES = (STATE_INVITATION, STATE_CONNECTING, STATE_ISSUING)
+
+
+# parts of the memory held by pending issuances
+MEMORY_PARTS = ("records", "credentials", "tasks", "streams")
+
+
+class RegistryFullError(Exception):
+    """Raised when no pending issuance can be evicted to make room."""
+
+
+def deep_sizeof(obj) -> int:
+    """Approximate memory held by obj and the containers and strings in it."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item) for item in obj)
+    return size
+
+
+def coroutine_sizeof(coro) -> int:
+    """Memory held by coro and the coroutines it awaits, with their frames."""
+    size = 0
+    while coro is not None:
+        size += sys.getsizeof(coro)
+        frame = getattr(coro, "cr_frame", None)
+        if frame is not None:
+            size += sys.getsizeof(frame)
+        coro = getattr(coro, "cr_await", None)
+    return size
+
+
+class PendingIssuance:
+    """Compact record of an issuance waiting to be completed."""
+
+    __slots__ = ("conn_id", "state", "created", "credential_size", "task", "stream")
+
+    def __init__(
+        self, conn_id: str, credential_size: int = 0, task: asyncio.Task = None
+    ):
+        self.conn_id = conn_id
+        self.state = STATE_INVITATION
+        self.created = time.monotonic()
+        # credential waiting to be issued, measured once as it does not change
+        self.credential_size = credential_size
+        self.task = task
+        # event stream of the issuance, set once it is opened
+        self.stream = None
+
+    def __repr__(self):
+        return f"<PendingIssuance {self.conn_id} state={self.state}>"
+
+    def sizes(self) -> Dict[str, int]:
+        """
+        Approximate memory held by the issuance, by part (see MEMORY_PARTS).
+
+        The task is counted with the chain of coroutines it currently awaits
+        and their frames, the stream with the events in its buffer.
+        """
+        task_size = 0
+        if self.task and not self.task.done():
+            task_size = sys.getsizeof(self.task) + coroutine_sizeof(
+                self.task.get_coro()
+            )
+        stream_size = 0
+        if self.stream is not None and not self.stream.closed:
+            stream_size = (
+                sys.getsizeof(self.stream)
+                + sys.getsizeof(self.stream.buffer)
+                + sum(deep_sizeof(event) for event in self.stream.buffer)
+            )
+        return {
+            "records": sys.getsizeof(self)
+            + sys.getsizeof(self.conn_id)
+            + sys.getsizeof(self.created),
+            "credentials": self.credential_size,
+            "tasks": task_size,
+            "streams": stream_size,
+        }
+
+
+class IssuanceRegistry:
+    """
+    Bounded registry of pending issuances, ordered by creation time.
+
+    When the registry is full, the oldest issuances whose invitation has not
+    been used yet are evicted to make room for new ones.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size
+        self.records: OrderedDict[str, PendingIssuance] = OrderedDict()
+        self.n_evicted = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, conn_id: str):
+        return conn_id in self.records
+
+    def get(self, conn_id: str) -> Optional[PendingIssuance]:
+        return self.records.get(conn_id)
+
+    def add(self, record: PendingIssuance) -> List[PendingIssuance]:
+        """
+        Add record to the registry.
+        :param record: record to add
+        :return: records evicted to make room for the new one
+        :raises RegistryFullError: if registry is full and nothing can be evicted
+
+        """
+        evicted = []
+        if self.max_size and len(self.records) >= self.max_size:
+            evicted = self.evict(len(self.records) - self.max_size + 1)
+            if len(self.records) >= self.max_size:
+                raise RegistryFullError(
+                    f"{len(self.records)} issuances pending, none can be evicted"
+                )
+        self.records[record.conn_id] = record
+        return evicted
+
+    def remove(self, conn_id: str) -> Optional[PendingIssuance]:
+        return self.records.pop(conn_id, None)
+
+    def set_state(self, conn_id: str, state: str):
+        record = self.records.get(conn_id)
+        if record:
+            record.state = state
+
+    def mark_used(self, conn_id: str):
+        """Record that the holder used the invitation, so it is not evicted."""
+        record = self.records.get(conn_id)
+        if record and record.state == STATE_INVITATION:
+            record.state = STATE_CONNECTING
+
+    def evict(self, n: int) -> List[PendingIssuance]:
+        """Remove up to n of the oldest records whose invitation was not used."""
+        victims = []
+        for record in self.records.values():
+            if len(victims) >= n:
+                break
+            if record.state == STATE_INVITATION:
+                victims.append(record)
+        for record in victims:
+            self.remove(record.conn_id)
+        self.n_evicted += len(victims)
+        if victims:
+            logger.info("evicted %d unused invitation(s)", len(victims))
+        return victims
+
+    def stats(self) -> Dict:
+        """Counts and memory estimate, walks all records."""
+        counts = dict.fromkeys(STATES, 0)
+        memory = dict.fromkeys(MEMORY_PARTS, 0)
+        for record in self.records.values():
+            counts[record.state] += 1
+            for part, size in record.sizes().items():
+                memory[part] += size
+        return {
+            "pending": len(self.records),
+            "max_pending": self.max_size,
+            "by_state": counts,
+            "evicted": self.n_evicted,
+            "approx_bytes": sum(memory.values()),
+            "approx_bytes_by_part": memory,
+        }
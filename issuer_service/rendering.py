@@ -0,0 +1,62 @@
+"""Template rendering with a lazily created jinja2 environment."""
+
+import functools
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+
+class Templates:
+    """
+    Jinja2 environment for the templates in `template_dir`.
+
+    jinja2 is imported when the environment is first needed, either by a
+    request or by `warm_up`, which is called in the background after the
+    server is bound.
+    """
+
+    def __init__(self, template_dir: Path):
+        self.template_dir = template_dir
+        self._env = None
+        self._lock = threading.Lock()
+
+    @property
+    def env(self):
+        if self._env is None:
+            with self._lock:
+                if self._env is None:
+                    import jinja2
+
+                    self._env = jinja2.Environment(
+                        loader=jinja2.FileSystemLoader(self.template_dir),
+                        autoescape=True,
+                    )
+        return self._env
+
+    def render(self, template_name: str, context: Optional[dict]) -> str:
+        return self.env.get_template(template_name).render(context or {})
+
+    def warm_up(self):
+        """Create the environment and compile all templates."""
+        for template_name in self.env.list_templates():
+            self.env.get_template(template_name)
+
+
+def template(template_name: str):
+    """Render the context returned by the decorated handler as HTML."""
+
+    def decorator(handler: Callable[[web.Request], Awaitable[Optional[dict]]]):
+        @functools.wraps(handler)
+        async def wrapped(request: web.Request):
+            context = await handler(request)
+            templates: Templates = request.app["templates"]
+            return web.Response(
+                text=templates.render(template_name, context),
+                content_type="text/html",
+            )
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,164 @@
+"""Priority scheduling of admin API calls."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict, Optional, Tuple
+
+from .presets import ADMIN_CLEANUP_MAX_DEFER
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority classes of admin API calls, highest priority first."""
+
+    # a user is waiting for the response
+    INTERACTIVE = 0
+    # credential issuance in the background
+    ISSUANCE = 1
+    # record removal, deferred while the agent is saturated
+    CLEANUP = 2
+
+
+class WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait: float):
+        self.count += 1
+        self.total += wait
+        self.max = max(self.max, wait)
+
+
+class AdminScheduler:
+    """
+    Orders admin API calls by priority.
+
+    At most `max_concurrency` calls run at a time, and at most
+    `class_limits[priority]` calls of each class. When calls have to wait,
+    they are started by priority, then in order of arrival. Cleanup calls are
+    deferred while the agent is saturated, i.e. while other calls run and
+    cleanup would take the last free slot, or other calls are waiting, but
+    for no longer than `max_cleanup_defer` seconds (None: without bound).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = None,
+        class_limits: Dict[Priority, Optional[int]] = None,
+        max_cleanup_defer: Optional[float] = ADMIN_CLEANUP_MAX_DEFER,
+    ):
+        self.max_concurrency = max_concurrency
+        self.class_limits = class_limits or {}
+        self.max_cleanup_defer = max_cleanup_defer
+        self.running: Dict[Priority, int] = dict.fromkeys(Priority, 0)
+        self.queues: Dict[Priority, Deque[Tuple[asyncio.Future, float]]] = {
+            priority: deque() for priority in Priority
+        }
+        self.wait_stats: Dict[Priority, WaitStats] = {
+            priority: WaitStats() for priority in Priority
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority):
+        """Wait until a call of class `priority` may run."""
+        enqueued = time.monotonic()
+        if self.must_queue(priority):
+            future = asyncio.get_event_loop().create_future()
+            self.queues[priority].append((future, enqueued))
+            if priority is Priority.CLEANUP and self.max_cleanup_defer is not None:
+                asyncio.get_event_loop().call_later(
+                    self.max_cleanup_defer, self.start_waiting
+                )
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # slot was handed over already
+                    self.release(priority)
+                else:
+                    try:
+                        self.queues[priority].remove((future, enqueued))
+                    except ValueError:
+                        pass
+                    self.start_waiting()
+                raise
+        else:
+            self.running[priority] += 1
+        self.wait_stats[priority].add(time.monotonic() - enqueued)
+
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def must_queue(self, priority: Priority) -> bool:
+        # calls of the same or a higher priority that wait go first
+        if any(self.queues[p] for p in Priority if p <= priority):
+            return True
+        return not self.can_start(priority)
+
+    def can_start(self, priority: Priority, waited: float = 0) -> bool:
+        total = sum(self.running.values())
+        if self.max_concurrency and total >= self.max_concurrency:
+            return False
+        limit = self.class_limits.get(priority)
+        if limit and self.running[priority] >= limit:
+            return False
+        if priority is Priority.CLEANUP and self.saturated(total):
+            return (
+                self.max_cleanup_defer is not None and waited >= self.max_cleanup_defer
+            )
+        return True
+
+    def saturated(self, total: int) -> bool:
+        # an idle agent is never saturated, even with a single slot
+        if self.max_concurrency and total and total >= self.max_concurrency - 1:
+            return True
+        return any(self.queues[p] for p in Priority if p < Priority.CLEANUP)
+
+    def release(self, priority: Priority):
+        self.running[priority] -= 1
+        self.start_waiting()
+
+    def start_waiting(self):
+        """Hand free slots to waiting calls, by priority."""
+        now = time.monotonic()
+        for priority in Priority:
+            queue = self.queues[priority]
+            while queue:
+                future, enqueued = queue[0]
+                if future.cancelled():
+                    queue.popleft()
+                    continue
+                if not self.can_start(priority, now - enqueued):
+                    break
+                queue.popleft()
+                self.running[priority] += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "classes": {
+                priority.name.lower(): {
+                    "running": self.running[priority],
+                    "waiting": len(self.queues[priority]),
+                    "limit": self.class_limits.get(priority),
+                    "started": stats.count,
+                    "mean_wait_ms": (
+                        stats.total / stats.count * 1000 if stats.count else 0
+                    ),
+                    "max_wait_ms": stats.max * 1000,
+                }
+                for priority, stats in self.wait_stats.items()
+            },
+        }
@@ -1,16 +1,25 @@
+import hmac
+import time
+
 from base64 import b64encode
 from io import BytesIO
+from uuid import uuid4
 
 import aiohttp
-import aiohttp_jinja2
-import qrcode
 
 from aiohttp.web import Request, Response
 
 from .controller import Controller
+from .idempotency import InvitationCache, make_key
+from .presets import IDEMPOTENCY_MIN_VALIDITY
+from .registry import STATE_INVITATION, RegistryFullError
+from .rendering import template
 
 
 def make_qr_b64(payload: str):
+    # imported on first use (or by warm_up) to speed up startup
+    import qrcode
+
     qr = qrcode.make(payload)
     buffered = BytesIO()
     qr.save(buffered)
@@ -18,63 +27,145 @@ def make_qr_b64(payload: str):
     return qr_b64
 
 
-@aiohttp_jinja2.template("index.jinja2")
+def warm_up():
+    """Import dependencies deferred until after startup."""
+    import qrcode  # noqa: F401
+
+
+@template("index.jinja2")
 async def index(request: Request):
-    pass
+    return {"idempotency_token": uuid4().hex}
 
 
-@aiohttp_jinja2.template("invitation.jinja2")
+@template("invitation.jinja2")
 async def issue(request: Request):
     # Flow:
     # 1) request data via form
     # 2) create & display oob invite -> "continue with wallet"
     # 3) wait for event connection complete
     # 4) create and send credential offer with auto_issue:true
+    #
+    # Repeated submissions of the same data get the invitation created for the
+    # first one as long as it is unused and valid for a while longer.
 
     app = request.app
-    requester_no = app["n_requests"] + 1
-    app["n_requests"] = requester_no
     controller: Controller = app["controller"]
+    cache: InvitationCache = app["invitation_cache"]
     form_data = await request.post()
+    key = make_key(
+        form_data.get("idempotencyToken"),
+        form_data["firstName"],
+        form_data["lastName"],
+        form_data["email"],
+    )
     try:
-        invitation_record = await controller.create_oob_invitation(
-            f"requester #{requester_no}"
-        )
-        invitation_url: str = invitation_record["invitation_url"]
-        invitation_msg_id = invitation_record["invi_msg_id"]
+        entry = cache.get(key)
+        context = await cache.wait(entry) if entry else None
+        if context:
+            record = controller.registry.get(context["conn_id"])
+            # the holder has not used the invitation yet
+            if record and record.state == STATE_INVITATION:
+                timeout = context["timeout"]
+                if timeout:
+                    # the issuance timeout runs from the creation of the record
+                    timeout -= time.monotonic() - record.created
+                if not timeout or timeout >= IDEMPOTENCY_MIN_VALIDITY:
+                    cache.hits += 1
+                    return {**context, "timeout": timeout}
+
+        entry = cache.reserve(key)
+        try:
+            context = await create_invitation(request, form_data)
+            entry.future.set_result(context)
+        finally:
+            # also on cancellation, so that no submission waits for it
+            if not entry.future.done():
+                cache.fail(key, entry)
+        return context
 
-        conn_list = await controller.query_connections(
-            invitation_msg_id=invitation_msg_id, state="invitation"
-        )
-        conn_record = conn_list[0]
-        conn_id = conn_record["connection_id"]
-
-        # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-        # fix invitation url
-        if app["oob_base_url"]:
-            invitation_url = (
-                f"{app['oob_base_url']}{invitation_url[invitation_url.find('?'):]}"
-            )
-        # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-
-        qr_b64 = make_qr_b64(invitation_url)
-
-        await controller.issue_nextcloud_credential(
-            conn_id,
-            form_data["firstName"],
-            form_data["lastName"],
-            form_data["email"],
+    except aiohttp.ClientResponseError:
+        raise aiohttp.web.HTTPServerError(reason="Could not obtain invitation record")
+    except RegistryFullError:
+        raise aiohttp.web.HTTPServiceUnavailable(reason="Too many pending issuances")
+
+
+async def create_invitation(request: Request, form_data) -> dict:
+    app = request.app
+    requester_no = app["n_requests"] + 1
+    app["n_requests"] = requester_no
+    controller: Controller = app["controller"]
+
+    invitation_record = await controller.create_oob_invitation(
+        f"requester #{requester_no}"
+    )
+    invitation_url: str = invitation_record["invitation_url"]
+    invitation_msg_id = invitation_record["invi_msg_id"]
+
+    conn_list = await controller.query_connections(
+        invitation_msg_id=invitation_msg_id, state="invitation"
+    )
+    conn_record = conn_list[0]
+    conn_id = conn_record["connection_id"]
+
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    # fix invitation url
+    if app["oob_base_url"]:
+        invitation_url = (
+            f"{app['oob_base_url']}{invitation_url[invitation_url.find('?'):]}"
         )
+    # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-        return {
-            "qr_b64": qr_b64,
-            "invitation_url": invitation_url,
-            "timeout": controller.issuance_timeout,
-        }
+    qr_b64 = make_qr_b64(invitation_url)
 
-    except aiohttp.ClientResponseError:
-        raise aiohttp.web.HTTPServerError(reason="Could not obtain invitation record")
+    await controller.issue_nextcloud_credential(
+        conn_id,
+        form_data["firstName"],
+        form_data["lastName"],
+        form_data["email"],
+    )
+
+    return {
+        "conn_id": conn_id,
+        "qr_b64": qr_b64,
+        "invitation_url": invitation_url,
+        "timeout": controller.issuance_timeout,
+    }
 
 
 async def healthcheck(request: Request):
     return Response(text="OK")
+
+
+async def webhook(request: Request):
+    api_key = request.app["webhook_api_key"]
+    if api_key and not hmac.compare_digest(
+        request.headers.get("x-api-key", "").encode("utf-8"), api_key.encode("utf-8")
+    ):
+        raise aiohttp.web.HTTPUnauthorized()
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise aiohttp.web.HTTPBadRequest(reason="Payload is not valid json")
+
+    topic = request.match_info["topic"]
+    controller: Controller = request.app["controller"]
+    # same shape as events received over the websocket
+    await controller.ws_client.dispatch_event(
+        topic, {"topic": topic, "payload": payload}
+    )
+    return Response()
+
+
+async def scheduler(request: Request):
+    controller: Controller = request.app["controller"]
+    return aiohttp.web.json_response(controller.scheduler.stats())
+
+
+async def issuances(request: Request):
+    controller: Controller = request.app["controller"]
+    stats = controller.registry.stats()
+    stats["idempotency_cache"] = {
+        "entries": len(request.app["invitation_cache"]),
+        "hits": request.app["invitation_cache"].hits,
+    }
+    return aiohttp.web.json_response(stats)
@@ -1,12 +1,14 @@
+import asyncio
 import logging
 
-import jinja2
-import aiohttp_jinja2
 from aiohttp import ClientSession, web
 
+from . import views
 from .controller import Controller
+from .idempotency import InvitationCache
 from .presets import IMAGES_DIR, TEMPLATE_DIR
-from .views import healthcheck, index, issue
+from .rendering import Templates
+from .views import healthcheck, index, issuances, issue, scheduler, webhook
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +21,26 @@ class Webapp:
         agent_admin_api: str,
         controller: Controller,
         oob_base_url: str = None,
+        idempotency_ttl: float = None,
+        webhooks: bool = False,
+        webhook_api_key: str = None,
     ):
         self.app = web.Application()
-        aiohttp_jinja2.setup(self.app, loader=jinja2.FileSystemLoader(TEMPLATE_DIR))
+        self.app["templates"] = Templates(TEMPLATE_DIR)
         self.app["agent_admin_api"] = agent_admin_api
         self.app["oob_base_url"] = oob_base_url
         self.app["controller"] = controller
+        self.app["webhook_api_key"] = webhook_api_key
         self.app["n_requests"] = 0
+        if controller.issuance_timeout:
+            # cached invitations must not outlive the issuance
+            idempotency_ttl = min(idempotency_ttl or 0, controller.issuance_timeout)
+        self.app["invitation_cache"] = InvitationCache(
+            idempotency_ttl or 0, controller.registry.max_size
+        )
         self.setup_routes()
+        if webhooks:
+            self.app.add_routes([web.post("/topic/{topic}/", webhook)])
         runner = web.AppRunner(self.app)
         await runner.setup()
         self.site = web.TCPSite(runner, host, port)
@@ -36,6 +50,14 @@ class Webapp:
         site = self.site
         await site.start()
         logger.info("=== server running on %s:%d ===", site._host, site._port)
+        return asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        """Load what was deferred to speed up startup, without blocking the loop."""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.app["templates"].warm_up)
+        await loop.run_in_executor(None, views.warm_up)
+        logger.debug("warm-up done")
 
     async def stop(self):
         logger.debug("shutting down webapp")
@@ -50,6 +72,8 @@ class Webapp:
                 web.get("/", index),
                 web.post("/", issue),
                 web.get("/health", healthcheck),
+                web.get("/issuances", issuances),
+                web.get("/scheduler", scheduler),
                 web.static("/images", IMAGES_DIR),
             ]
         )
@@ -1,25 +1,197 @@
 """WS Client implementation."""
 
 import asyncio
+import hashlib
+import json
 import logging
+from collections import OrderedDict, deque
 from json import JSONDecodeError
-from typing import Callable, Coroutine, List, Optional
+from typing import Callable, Coroutine, Dict, Hashable, List, Optional, Sequence, Union
 
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# stream overflow policies
+# discard the oldest buffered event to make room for the new one
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+# discard the new event
+OVERFLOW_DROP_NEWEST = "drop_newest"
+# close the stream; reading from it raises StreamOverflowError
+OVERFLOW_ERROR = "error"
+
+DEFAULT_STREAM_BUFFER = 32
+
+
+class StreamOverflowError(Exception):
+    """Raised when reading from a stream that was closed by an overflow."""
+
+
+class EventStream:
+    """
+    Async iterator over the events of one or more topics.
+
+    Events are buffered from the moment the stream is created until it is
+    closed, so none are lost between reads. At most `maxsize` events are
+    buffered; `overflow` decides what happens to further events.
+    """
+
+    __slots__ = (
+        "ws_client",
+        "topics",
+        "key_field",
+        "key",
+        "filter_",
+        "maxsize",
+        "overflow",
+        "buffer",
+        "waiter",
+        "closed",
+        "overflowed",
+        "n_dropped",
+    )
+
+    def __init__(
+        self,
+        ws_client: "WSClient",
+        topics: Sequence[str],
+        key_field: Optional[str] = None,
+        key: Hashable = None,
+        filter_: Callable[[dict], bool] = None,
+        maxsize: int = DEFAULT_STREAM_BUFFER,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+    ):
+        self.ws_client = ws_client
+        self.topics = topics
+        self.key_field = key_field
+        self.key = key
+        self.filter_ = filter_
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.buffer = deque()
+        self.waiter: Optional[asyncio.Future] = None
+        self.closed = False
+        self.overflowed = False
+        self.n_dropped = 0
+
+    def push(self, msg: dict):
+        if self.closed:
+            return
+        if self.filter_:
+            try:
+                if not self.filter_(msg):
+                    return
+            except Exception:
+                logger.exception("Error in filter of stream %s, event dropped", self)
+                return
+        if len(self.buffer) >= self.maxsize:
+            self.n_dropped += 1
+            if self.overflow == OVERFLOW_DROP_NEWEST:
+                return
+            if self.overflow == OVERFLOW_ERROR:
+                logger.warning("stream %s overflowed, closing it", self)
+                self.overflowed = True
+                self.closed = True
+                self._wake()
+                # not removed right away, streams are being iterated over
+                asyncio.get_event_loop().call_soon(self.ws_client.remove_stream, self)
+                return
+            self.buffer.popleft()
+        self.buffer.append(msg)
+        self._wake()
+
+    def _wake(self):
+        if self.waiter and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        while not self.buffer or self.overflowed:
+            if self.overflowed:
+                raise StreamOverflowError(f"{self.n_dropped} event(s) dropped")
+            if self.closed:
+                raise StopAsyncIteration
+            self.waiter = asyncio.get_event_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.buffer.popleft()
+
+    async def get(self, timeout: float = None) -> dict:
+        """
+        Return the next event.
+        :raises asyncio.TimeoutError: on timeout
+        :raises StopAsyncIteration: if the stream is closed
+
+        """
+        return await asyncio.wait_for(self.__anext__(), timeout)
+
+    async def wait_for(
+        self, filter_: Callable[[dict], bool] = None, timeout: float = None
+    ) -> dict:
+        """Skip events until one passes filter_ and return it."""
+
+        async def _wait():
+            async for msg in self:
+                if not filter_ or filter_(msg):
+                    return msg
+            raise StopAsyncIteration
+
+        return await asyncio.wait_for(_wait(), timeout)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.ws_client.remove_stream(self)
+            self._wake()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"<EventStream {'/'.join(self.topics)} {self.key_field}={self.key}>"
+
 
 class WSClient:
-    """WS Client."""
+    """
+    WS Client.
 
-    def __init__(self, ws_endpoint: str, session: aiohttp.ClientSession):
+    Dispatches agent events to subscribers. Events arrive over the websocket
+    at `ws_endpoint` and/or are passed in by the webhook receiver. If both
+    sources are used, `dedupe` must be set so that each event is only
+    dispatched once.
+    """
+
+    # number of recent events remembered for de-duplication
+    DEDUPE_WINDOW = 1024
+
+    def __init__(
+        self,
+        ws_endpoint: Optional[str],
+        session: aiohttp.ClientSession,
+        dedupe: bool = False,
+    ):
         self.topics_to_processors: dict[str, List[Callable[[dict], Coroutine]]] = {}
+        # topic -> key field -> key -> streams (dict as ordered set)
+        self.streams: Dict[
+            str, Dict[Optional[str], Dict[Hashable, Dict[EventStream, None]]]
+        ] = {}
         self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
         self.ws_endpoint = ws_endpoint
         self.session = session
+        self.dedupe = dedupe
+        self.recent_events: OrderedDict[str, None] = OrderedDict()
 
     async def start(self):
+        if not self.ws_endpoint:
+            # events are only received via webhooks
+            return None
         loop = asyncio.get_event_loop()
         task = loop.create_task(self.run())
         return task
@@ -70,24 +242,103 @@ class WSClient:
 
         try:
             payload = msg.json()
-            if "topic" in payload:
-                await self.notify_subscribers(payload["topic"], payload)
+            if isinstance(payload, dict) and isinstance(payload.get("topic"), str):
+                await self.dispatch_event(payload["topic"], payload)
         except JSONDecodeError:
             logger.exception("msg is not valid json")
 
+    async def dispatch_event(self, topic: str, msg: dict):
+        if self.dedupe and self.is_duplicate(topic, msg):
+            logger.debug("dropping duplicate event with topic '%s'", topic)
+            return
+        await self.notify_subscribers(topic, msg)
+
+    def is_duplicate(self, topic: str, msg: dict) -> bool:
+        key = hashlib.sha1(
+            json.dumps([topic, msg.get("payload")], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        if key in self.recent_events:
+            return True
+        self.recent_events[key] = None
+        if len(self.recent_events) > self.DEDUPE_WINDOW:
+            self.recent_events.popitem(last=False)
+        return False
+
     async def notify_subscribers(self, topic: str, msg: dict):
-        for top, processors in self.topics_to_processors.items():
-            if top == topic:
-                # TODO: remove async? else: schedule without await?
-                for processor in processors:
-                    try:
-                        await processor(msg)
-                    except Exception:
-                        logger.exception(
-                            "Error while processing event. Processor: %s", processor
-                        )
-
-                break
+        key_fields = self.streams.get(topic)
+        if key_fields:
+            payload = msg.get("payload")
+            for key_field, keys_to_streams in key_fields.items():
+                key = None
+                if key_field:
+                    if not isinstance(payload, dict):
+                        continue
+                    key = payload.get(key_field)
+                try:
+                    streams = keys_to_streams.get(key, ())
+                except TypeError:
+                    logger.warning(
+                        "dropping event with unhashable %s for keyed streams",
+                        key_field,
+                    )
+                    continue
+                for stream in streams:
+                    stream.push(msg)
+
+        # copy, processors may unsubscribe while being notified
+        # TODO: remove async? else: schedule without await?
+        for processor in list(self.topics_to_processors.get(topic, ())):
+            try:
+                await processor(msg)
+            except Exception:
+                logger.exception(
+                    "Error while processing event. Processor: %s", processor
+                )
+
+    def stream(
+        self,
+        topics: Union[str, Sequence[str]],
+        key: Hashable = None,
+        key_field: str = None,
+        filter_: Callable[[dict], bool] = None,
+        maxsize: int = DEFAULT_STREAM_BUFFER,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+    ) -> EventStream:
+        """
+        Subscribe to events of one or more topics.
+        :param topics: event topic(s)
+        :param key: only pass events whose payload has this value in key_field
+        :param key_field: payload field to match key against
+        :param filter_: event filter, applied before events are buffered
+        :param maxsize: maximum number of buffered events
+        :param overflow: overflow policy, one of the OVERFLOW_* constants
+        :return: stream of events, to be closed when no longer needed
+
+        """
+        if isinstance(topics, str):
+            topics = (topics,)
+        if key_field is None:
+            key = None
+        stream = EventStream(self, topics, key_field, key, filter_, maxsize, overflow)
+        for topic in topics:
+            keys_to_streams = self.streams.setdefault(topic, {}).setdefault(
+                key_field, {}
+            )
+            keys_to_streams.setdefault(key, {})[stream] = None
+        return stream
+
+    def remove_stream(self, stream: EventStream):
+        for topic in stream.topics:
+            key_fields = self.streams.get(topic, {})
+            keys_to_streams = key_fields.get(stream.key_field, {})
+            streams = keys_to_streams.get(stream.key, {})
+            streams.pop(stream, None)
+            if not streams:
+                keys_to_streams.pop(stream.key, None)
+            if not keys_to_streams:
+                key_fields.pop(stream.key_field, None)
+            if not key_fields:
+                self.streams.pop(topic, None)
 
     def subscribe(self, topic: str, processor: Callable[[dict], Coroutine]):
         if topic not in self.topics_to_processors:
@@ -117,23 +368,12 @@ class WSClient:
         :raises asyncio.TimeoutError: on timeout
 
         """
-        future = asyncio.get_event_loop().create_future()
-
-        async def _handle_event(msg: dict):
-            if filter_ and not filter_(msg):
-                return
-            future.set_result(msg)
-            self.unsubscribe(topic, _handle_event)
-
-        self.subscribe(topic, _handle_event)
         logger.debug("waiting for event with topic '%s'", topic)
-        try:
-            result = await asyncio.wait_for(future, timeout=timeout)
-        except asyncio.TimeoutError:
-            self.unsubscribe(topic, _handle_event)
-            raise
-
-        return result
+        # only the first matching event is of interest
+        async with self.stream(
+            topic, filter_=filter_, maxsize=1, overflow=OVERFLOW_DROP_NEWEST
+        ) as stream:
+            return await stream.get(timeout)
 
     async def stop(self):
         if self.ws and not self.ws.closed:
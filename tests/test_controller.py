@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from issuer_service.controller import TOPIC_CONNECTIONS, Controller
+from issuer_service.registry import (
+    STATE_CONNECTING,
+    STATE_INVITATION,
+    RegistryFullError,
+)
+from issuer_service.ws_client import WSClient
+
+
+class FakeResponse:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, url):
+        self.deleted.append(url)
+        return FakeResponse()
+
+
+def make_controller(**kwargs):
+    session = FakeSession()
+    controller = Controller(session, WSClient(None, session), **kwargs)
+    controller.dids = {"bls12381g2": "did:key:issuer"}
+    return controller
+
+
+async def issue(controller, conn_id):
+    await controller.issue_nextcloud_credential(conn_id, "Jane", "Doe", "jane@x.org")
+
+
+def connection_event(conn_id, state):
+    return {
+        "topic": TOPIC_CONNECTIONS,
+        "payload": {"connection_id": conn_id, "state": state},
+    }
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_discard_issuance():
+    async def main():
+        controller = make_controller()
+        await issue(controller, "a")
+        record = controller.registry.get("a")
+        controller.discard_issuance(record)
+        await asyncio.sleep(0.01)
+        assert record.task.cancelled()
+        assert controller.session.deleted == ["/connections/a"]
+        assert "a" not in controller.registry
+
+    run(main())
+
+
+def test_connection_event_marks_invitation_used():
+    async def main():
+        controller = make_controller(max_pending_issuances=2)
+        await issue(controller, "a")
+        await issue(controller, "b")
+        await asyncio.sleep(0)
+        ws_client = controller.ws_client
+        # the record is announced in invitation state when it is created
+        await ws_client.dispatch_event(
+            TOPIC_CONNECTIONS, connection_event("b", "invitation")
+        )
+        await ws_client.dispatch_event(
+            TOPIC_CONNECTIONS, connection_event("a", "request")
+        )
+        await asyncio.sleep(0)
+        assert controller.registry.get("a").state == STATE_CONNECTING
+        assert controller.registry.get("b").state == STATE_INVITATION
+
+        await issue(controller, "c")
+        await asyncio.sleep(0.01)
+        assert list(controller.registry.records) == ["a", "c"]
+        assert controller.session.deleted == ["/connections/b"]
+
+    run(main())
+
+
+def test_registry_full():
+    async def main():
+        controller = make_controller(max_pending_issuances=1)
+        await issue(controller, "a")
+        controller.registry.mark_used("a")
+        with pytest.raises(RegistryFullError):
+            await issue(controller, "b")
+        await asyncio.sleep(0.01)
+        # invitation for b cannot be used, its connection record is removed
+        assert controller.session.deleted == ["/connections/b"]
+        assert list(controller.registry.records) == ["a"]
+
+    run(main())
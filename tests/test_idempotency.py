@@ -0,0 +1,41 @@
+import asyncio
+
+from issuer_service.idempotency import InvitationCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_get_invitation():
+    async def main():
+        cache = InvitationCache(ttl=60)
+        entry = cache.reserve("key")
+        waiter = asyncio.ensure_future(cache.wait(cache.get("key")))
+        entry.future.set_result({"conn_id": "a"})
+        assert await waiter == {"conn_id": "a"}
+
+    run(main())
+
+
+def test_fail_releases_waiters():
+    async def main():
+        cache = InvitationCache(ttl=60)
+        entry = cache.reserve("key")
+        waiter = asyncio.ensure_future(cache.wait(cache.get("key")))
+        await asyncio.sleep(0)
+        cache.fail("key", entry)
+        assert await asyncio.wait_for(waiter, 1) is None
+        assert cache.get("key") is None
+
+    run(main())
+
+
+def test_wait_times_out():
+    async def main():
+        cache = InvitationCache(ttl=60, wait_timeout=0.01)
+        entry = cache.reserve("key")
+        assert await cache.wait(entry) is None
+        assert not entry.future.done()
+
+    run(main())
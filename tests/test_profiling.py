@@ -0,0 +1,44 @@
+import sys
+import threading
+
+from issuer_service.profiling import (
+    PROFILE_STARTUP_ENV_VAR,
+    PROFILE_STARTUP_FLAG,
+    StartupProfiler,
+)
+
+
+def test_nested_import_stack_is_per_thread():
+    profiler = StartupProfiler()
+    profiler.children.append(1.0)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(list(profiler.children)))
+    thread.start()
+    thread.join()
+    assert seen == [[]]
+    assert profiler.children == [1.0]
+
+
+def test_imports_are_timed():
+    sys.modules.pop("colorsys", None)
+    profiler = StartupProfiler()
+    profiler.install()
+    try:
+        import colorsys  # noqa: F401
+    finally:
+        profiler.uninstall()
+    self_time, cumulative = profiler.imports["colorsys"]
+    assert 0 <= self_time <= cumulative
+    assert profiler.children == []
+
+
+def test_enabled_by_flag_or_environment():
+    assert StartupProfiler.from_argv(["issuer_service"], {}) is None
+    assert StartupProfiler.from_argv([], {PROFILE_STARTUP_ENV_VAR: "false"}) is None
+    for argv, environ in (
+        ([PROFILE_STARTUP_FLAG], {}),
+        ([], {PROFILE_STARTUP_ENV_VAR: "True"}),
+    ):
+        profiler = StartupProfiler.from_argv(argv, environ)
+        assert profiler is not None
+        profiler.uninstall()
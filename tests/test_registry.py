@@ -0,0 +1,46 @@
+import sys
+
+from issuer_service.registry import (
+    STATE_CONNECTING,
+    STATE_INVITATION,
+    STATE_ISSUING,
+    IssuanceRegistry,
+    PendingIssuance,
+    deep_sizeof,
+)
+
+
+def test_evict_skips_used_invitations():
+    registry = IssuanceRegistry(max_size=3)
+    for conn_id in ("a", "b", "c"):
+        registry.add(PendingIssuance(conn_id))
+    registry.mark_used("a")
+    registry.set_state("b", STATE_ISSUING)
+
+    evicted = registry.add(PendingIssuance("d"))
+
+    assert [record.conn_id for record in evicted] == ["c"]
+    assert list(registry.records) == ["a", "b", "d"]
+    assert registry.get("a").state == STATE_CONNECTING
+
+
+def test_mark_used_keeps_later_state():
+    registry = IssuanceRegistry()
+    registry.add(PendingIssuance("a"))
+    registry.set_state("a", STATE_ISSUING)
+    registry.mark_used("a")
+    assert registry.get("a").state == STATE_ISSUING
+    registry.add(PendingIssuance("b"))
+    assert registry.get("b").state == STATE_INVITATION
+
+
+def test_memory_estimate():
+    registry = IssuanceRegistry()
+    credential = {"credentialSubject": {"email": "jane@example.org"}}
+    registry.add(PendingIssuance("a", deep_sizeof(credential)))
+    memory = registry.stats()["approx_bytes_by_part"]
+    assert memory["credentials"] == deep_sizeof(credential) > sys.getsizeof(credential)
+    assert memory["records"] > 0
+    assert registry.stats()["approx_bytes"] == sum(memory.values())
+    registry.remove("a")
+    assert registry.stats()["approx_bytes"] == 0
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from issuer_service.scheduler import AdminScheduler, Priority
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def call(scheduler, priority, name, order, duration=0.01):
+    async with scheduler.slot(priority):
+        order.append(name)
+        await asyncio.sleep(duration)
+
+
+def test_waiting_calls_start_by_priority():
+    async def main():
+        scheduler = AdminScheduler(1, {}, None)
+        order = []
+        tasks = [asyncio.create_task(call(scheduler, Priority.ISSUANCE, "i0", order))]
+        await asyncio.sleep(0)
+        for priority, name in (
+            (Priority.CLEANUP, "c"),
+            (Priority.ISSUANCE, "i1"),
+            (Priority.INTERACTIVE, "u0"),
+            (Priority.INTERACTIVE, "u1"),
+        ):
+            tasks.append(asyncio.create_task(call(scheduler, priority, name, order)))
+        await asyncio.gather(*tasks)
+        assert order == ["i0", "u0", "u1", "i1", "c"]
+
+    run(main())
+
+
+def test_class_limit():
+    async def main():
+        scheduler = AdminScheduler(10, {Priority.ISSUANCE: 2})
+        running = max_running = 0
+
+        async def issue():
+            nonlocal running, max_running
+            async with scheduler.slot(Priority.ISSUANCE):
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        order = []
+        tasks = [asyncio.create_task(issue()) for _ in range(5)]
+        await asyncio.sleep(0)
+        # other classes are not held up by the issuance limit
+        await asyncio.wait_for(
+            call(scheduler, Priority.INTERACTIVE, "u", order, 0), 0.005
+        )
+        await asyncio.gather(*tasks)
+        assert max_running == 2
+        assert scheduler.running[Priority.ISSUANCE] == 0
+
+    run(main())
+
+
+def test_cancelled_waiter_passes_slot_on():
+    async def main():
+        scheduler = AdminScheduler(1, {})
+        order = []
+        first = asyncio.create_task(call(scheduler, Priority.INTERACTIVE, "a", order))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(
+            call(scheduler, Priority.INTERACTIVE, "cancelled", order)
+        )
+        last = asyncio.create_task(call(scheduler, Priority.ISSUANCE, "b", order))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(first, last)
+        assert order == ["a", "b"]
+        assert sum(scheduler.running.values()) == 0
+
+    run(main())
+
+
+def test_cancelled_after_handover_releases_slot():
+    async def main():
+        scheduler = AdminScheduler(1, {})
+        order = []
+        first = asyncio.create_task(call(scheduler, Priority.INTERACTIVE, "a", order))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(call(scheduler, Priority.INTERACTIVE, "w", order))
+        await asyncio.sleep(0)
+        await first
+        # slot was handed to waiter, which is cancelled before it resumes
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert sum(scheduler.running.values()) == 0
+        await asyncio.wait_for(
+            call(scheduler, Priority.INTERACTIVE, "b", order, 0), 0.1
+        )
+
+    run(main())
+
+
+def test_cleanup_runs_at_once_on_idle_agent():
+    async def main():
+        for max_cleanup_defer in (60, None):
+            scheduler = AdminScheduler(1, {}, max_cleanup_defer)
+            await asyncio.wait_for(call(scheduler, Priority.CLEANUP, "c", []), 0.1)
+
+    run(main())
+
+
+def test_cleanup_deferral_is_bounded():
+    async def main():
+        scheduler = AdminScheduler(2, {}, max_cleanup_defer=0.1)
+        order = []
+
+        async def load(name):
+            for i in range(20):
+                await call(scheduler, Priority.INTERACTIVE, f"{name}{i}", order)
+
+        # two callers keep the agent saturated
+        load_task = asyncio.gather(load("a"), load("b"))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        await call(scheduler, Priority.CLEANUP, "c", order, 0)
+        waited = time.monotonic() - start
+        assert 0.1 <= waited < 0.15
+        # deferred while the agent was busy, but not until the load ended
+        assert order.index("c") > 1
+        assert not load_task.done()
+        await load_task
+
+    run(main())
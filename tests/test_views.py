@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import aiohttp
+from aiohttp.test_utils import TestClient, TestServer
+
+from benchmarks.agent_stub import AgentStub
+from issuer_service.controller import Controller
+from issuer_service.views import issue
+from issuer_service.webapp import Webapp
+from issuer_service.ws_client import WSClient
+
+FORM = {"firstName": "Jane", "lastName": "Doe", "email": "jane@example.org"}
+# admin calls per invitation: create invitation, query connection
+INVITATION_CALLS = 2
+
+
+class SlowAgentStub(AgentStub):
+    """Creates invitations only once `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.called = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def create_invitation(self, request):
+        self.called.set()
+        await self.release.wait()
+        return await super().create_invitation(request)
+
+
+class FormRequest:
+    """Request with form data, for calling views directly."""
+
+    def __init__(self, app, form):
+        self.app = app
+        self.form = form
+
+    async def post(self):
+        return self.form
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def serve(test, controller_args=None, agent=None, dedupe=False, **setup_args):
+    """Run test(client, controller, agent) against a webapp and a stand-in agent."""
+    agent = agent or AgentStub()
+    url = await agent.start()
+    try:
+        async with aiohttp.ClientSession(base_url=url) as session:
+            controller = Controller(
+                session, WSClient(None, session, dedupe), **(controller_args or {})
+            )
+            controller.dids = {"bls12381g2": "did:key:issuer"}
+            webapp = Webapp()
+            await webapp.setup("127.0.0.1", 0, url, controller, **setup_args)
+            async with TestClient(TestServer(webapp.app)) as client:
+                await test(client, controller, agent)
+    finally:
+        await agent.stop()
+
+
+def test_registry_full():
+    async def test(client, controller, agent):
+        response = await client.post("/", data=FORM)
+        assert response.status == 200
+        controller.registry.mark_used(next(iter(controller.registry.records)))
+        response = await client.post("/", data={**FORM, "email": "john@example.org"})
+        assert response.status == 503
+
+    run(serve(test, {"max_pending_issuances": 1}))
+
+
+def test_repeated_submission_reuses_invitation():
+    async def test(client, controller, agent):
+        form = {**FORM, "idempotencyToken": "token"}
+        first = await (await client.post("/", data=form)).text()
+        record = next(iter(controller.registry.records.values()))
+        record.created -= 270
+        second = await (await client.post("/", data=form)).text()
+        assert agent.n_requests == INVITATION_CALLS
+        assert "valid for 10min" in first
+        # remaining time of the invitation, not the full issuance timeout
+        assert "valid for 5min" in second
+
+        # about to expire -> new invitation
+        record.created -= 290
+        await client.post("/", data=form)
+        assert agent.n_requests == 2 * INVITATION_CALLS
+
+    run(serve(test, {"issuance_timeout": 600}, idempotency_ttl=600))
+
+
+def test_used_invitation_is_not_reused():
+    async def test(client, controller, agent):
+        await client.post("/", data=FORM)
+        controller.registry.mark_used(next(iter(controller.registry.records)))
+        await client.post("/", data=FORM)
+        assert agent.n_requests == 2 * INVITATION_CALLS
+
+    run(serve(test, idempotency_ttl=600))
+
+
+def test_cancelled_submission_does_not_block_repeats():
+    async def test(client, controller, agent):
+        # handlers are called directly to cancel them deterministically
+        first = asyncio.create_task(issue(FormRequest(client.app, FORM)))
+        await agent.called.wait()
+        second = asyncio.create_task(issue(FormRequest(client.app, FORM)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        agent.release.set()
+        response = await asyncio.wait_for(second, 1)
+        assert response.status == 200
+        assert len(client.app["invitation_cache"]) == 1
+
+    run(serve(test, agent=SlowAgentStub(), idempotency_ttl=600))
+
+
+WEBHOOK_API_KEY = "secret"
+EVENT = {"connection_id": "a", "state": "completed"}
+
+
+def test_webhook_requires_api_key():
+    async def test(client, controller, agent):
+        async with controller.ws_client.stream("connections") as events:
+            for headers in ({}, {"x-api-key": "wrong"}, {"x-api-key": "sécret"}):
+                response = await client.post(
+                    "/topic/connections/", json=EVENT, headers=headers
+                )
+                assert response.status == 401
+            assert not events.buffer
+
+            response = await client.post(
+                "/topic/connections/",
+                json=EVENT,
+                headers={"x-api-key": WEBHOOK_API_KEY},
+            )
+            assert response.status == 200
+            assert await events.get(1) == {"topic": "connections", "payload": EVENT}
+
+    run(serve(test, webhooks=True, webhook_api_key=WEBHOOK_API_KEY))
+
+
+def test_event_from_both_sources_is_dispatched_once():
+    async def test(client, controller, agent):
+        ws_client = controller.ws_client
+        async with ws_client.stream("connections") as events:
+            await ws_client.handle_msg(
+                aiohttp.WSMessage(
+                    aiohttp.WSMsgType.TEXT,
+                    json.dumps({"topic": "connections", "payload": EVENT}),
+                    None,
+                )
+            )
+            response = await client.post(
+                "/topic/connections/",
+                json=EVENT,
+                headers={"x-api-key": WEBHOOK_API_KEY},
+            )
+            assert response.status == 200
+            assert len(events.buffer) == 1
+
+    run(serve(test, dedupe=True, webhooks=True, webhook_api_key=WEBHOOK_API_KEY))
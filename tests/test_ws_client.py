@@ -0,0 +1,158 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from issuer_service.ws_client import (
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_ERROR,
+    StreamOverflowError,
+    WSClient,
+)
+
+TOPIC = "connections"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_raising_filter_does_not_stop_dispatch():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        event = {"topic": TOPIC, "payload": {"state": "request"}}
+        async with ws_client.stream(
+            TOPIC, filter_=lambda ev: ev["payload"]["connection_id"] == "1"
+        ) as bad, ws_client.stream(TOPIC) as good:
+            await ws_client.dispatch_event(TOPIC, event)
+            assert await good.get(timeout=1) == event
+            assert not bad.buffer
+            assert not bad.closed
+
+    run(main())
+
+
+def test_raising_filter_does_not_stop_wait_for_event():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        event = {"topic": TOPIC, "payload": {"connection_id": "1"}}
+        bad = asyncio.ensure_future(
+            ws_client.wait_for_event(TOPIC, lambda ev: ev["payload"]["missing"], 0.1)
+        )
+        good = asyncio.ensure_future(
+            ws_client.wait_for_event(
+                TOPIC, lambda ev: ev["payload"]["connection_id"] == "1", 1
+            )
+        )
+        await asyncio.sleep(0)
+        await ws_client.dispatch_event(TOPIC, event)
+        assert await good == event
+        with pytest.raises(asyncio.TimeoutError):
+            await bad
+
+    run(main())
+
+
+def connection_event(conn_id, state="request"):
+    return {"topic": TOPIC, "payload": {"connection_id": conn_id, "state": state}}
+
+
+def buffered(stream):
+    return list(stream.buffer)
+
+
+def test_keyed_streams():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        async with ws_client.stream(
+            TOPIC, key="a", key_field="connection_id"
+        ) as a, ws_client.stream(
+            TOPIC, key="b", key_field="connection_id"
+        ) as b, ws_client.stream(
+            TOPIC
+        ) as every:
+            event = connection_event("a")
+            await ws_client.dispatch_event(TOPIC, event)
+            assert buffered(a) == [event]
+            assert buffered(b) == []
+            assert buffered(every) == [event]
+        assert ws_client.streams == {}
+
+    run(main())
+
+
+def test_stream_across_topics():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        other = "issue_credential_v2_0"
+        events = [
+            connection_event("a", "completed"),
+            {"topic": other, "payload": {"connection_id": "a", "state": "done"}},
+        ]
+        async with ws_client.stream(
+            (TOPIC, other), key="a", key_field="connection_id"
+        ) as stream:
+            for event in events:
+                await ws_client.dispatch_event(event["topic"], event)
+            assert [await stream.get(1), await stream.get(1)] == events
+
+    run(main())
+
+
+@pytest.mark.parametrize(
+    "overflow,expected",
+    [(OVERFLOW_DROP_OLDEST, ["b", "c"]), (OVERFLOW_DROP_NEWEST, ["a", "b"])],
+)
+def test_overflow_drop(overflow, expected):
+    async def main():
+        ws_client = WSClient(None, session=None)
+        async with ws_client.stream(TOPIC, maxsize=2, overflow=overflow) as stream:
+            for conn_id in ("a", "b", "c"):
+                await ws_client.dispatch_event(TOPIC, connection_event(conn_id))
+            received = [ev["payload"]["connection_id"] for ev in buffered(stream)]
+            assert received == expected
+            assert stream.n_dropped == 1
+
+    run(main())
+
+
+def test_overflow_error():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        async with ws_client.stream(
+            TOPIC, maxsize=1, overflow=OVERFLOW_ERROR
+        ) as stream, ws_client.stream(TOPIC) as other:
+            for conn_id in ("a", "b"):
+                await ws_client.dispatch_event(TOPIC, connection_event(conn_id))
+            with pytest.raises(StreamOverflowError):
+                await stream.get(1)
+            await asyncio.sleep(0)
+            # closed and removed, other streams are not affected
+            assert stream.closed
+            assert list(ws_client.streams[TOPIC][None][None]) == [other]
+            assert len(buffered(other)) == 2
+
+    run(main())
+
+
+def test_malformed_events_do_not_stop_dispatch():
+    async def main():
+        ws_client = WSClient(None, session=None)
+        async with ws_client.stream(
+            TOPIC, key="a", key_field="connection_id"
+        ) as keyed, ws_client.stream(TOPIC) as every:
+            malformed = [
+                {"topic": TOPIC, "payload": ["not", "a", "dict"]},
+                {"topic": TOPIC, "payload": {"connection_id": ["unhashable"]}},
+            ]
+            for event in malformed:
+                await ws_client.dispatch_event(TOPIC, event)
+            for data in ('["topic"]', '"topic"', '{"topic": ["unhashable"]}'):
+                await ws_client.handle_msg(
+                    aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, data, None)
+                )
+            assert buffered(keyed) == []
+            assert buffered(every) == malformed
+
+    run(main())